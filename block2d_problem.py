@@ -10,6 +10,8 @@ import os
 from dlx import DLX
 from exact_cover_problem import ExactCoverProblem
 from layout_info import Linfo
+from solution_cache import SolutionCache, problem_key
+from solution_validator import check_solutions
 
 
 # Using Golomb's pentomino names, not Conways
@@ -51,6 +53,12 @@ class Block2DProblem(ExactCoverProblem):
         prob_matrix = np.array(rows, dtype=np.bool)
         return prob_matrix
 
+    def col_bounds(self):
+        """The (lo, hi) cover bounds of columns that are not exactly-once.
+        By default, every block and every board space is used exactly once.
+        """
+        return None
+
     def linfos(self):
         """Row ids, which tie the numerical results to the original problem
         The return value at problem setup must match those post-solution.
@@ -79,6 +87,8 @@ class Block2DProblem(ExactCoverProblem):
         linfos = self.linfos()
 
         for lid in solution:
+            if lid >= len(linfos):
+                continue  # Rows past the linfos, e.g., slack rows, place no block
             linfo = linfos[lid]
             block_index = linfo.block_index
             layout_index = linfo.layout_index
@@ -99,6 +109,21 @@ class Block2DProblem(ExactCoverProblem):
         if do_save_plot:
             fig.savefig(fname=plot_filename, format='png')
 
+    def _cache_metadata(self, linfos, update_count, elapsed):
+        """Everything needed to interpret cached solutions without this code"""
+        return {
+            'name': self.name,
+            'board': self.board.astype(int).tolist(),
+            'layouts': {block.name: [layout.astype(int).tolist()
+                                     for layout in block.layouts]
+                        for block in self.blocks},
+            'linfos': [[linfo.name, linfo.block_index, linfo.layout_index,
+                        [int(x) for x in linfo.pos]]
+                       for linfo in linfos],
+            'updates': update_count,
+            'elapsed': elapsed,
+            }
+
     def set_solutions(self, solns):
         self.solutions = solns
 
@@ -107,13 +132,27 @@ class Block2DProblem(ExactCoverProblem):
               linfos_filename=None,
               prob_filename=None,
               solns_filename=None,
+              solns_array_filename=None,
               stats_filename=None,
 
               do_write_layouts=True,
               do_write_linfos=True,
               do_write_prob=True,
               do_write_solns=True,
-              do_write_stats=True):
+              do_write_solns_array=True,
+              do_write_stats=True,
+
+              do_use_cache=True,
+              solution_cache=None,
+              do_validate=True):
+        """Solve the problem, or reuse the solutions of an identical problem.
+        If do_use_cache is set, solution_cache (by default, a SolutionCache in
+            the working directory) is consulted before searching.
+        If do_validate is set, every solution is checked to be an exact cover,
+            and ValueError is raised for invalid or duplicate solutions.
+            Only validated solutions are cached, and a cached entry that
+            fails validation is discarded and the problem is searched again.
+        """
         name = self.name
         blocks = self.blocks
         linfos = self.linfos()
@@ -131,6 +170,8 @@ class Block2DProblem(ExactCoverProblem):
             prob_filename = self.get_filename(name, 'prob')
         if solns_filename is None:
             solns_filename = self.get_filename(name, 'solns')
+        if solns_array_filename is None:
+            solns_array_filename = self.get_filename(name, 'solns_array')
         if stats_filename is None:
             stats_filename = self.get_filename(name, 'stats')
 
@@ -149,19 +190,57 @@ class Block2DProblem(ExactCoverProblem):
         if do_write_prob:
             self.io_write_prob_matrix(prob_matrix, prob_filename)
 
-        dlx = DLX(name, prob_matrix)
-        solns = dlx.find_solutions()
+        cache_hit = None
+        if do_use_cache:
+            if solution_cache is None:
+                solution_cache = SolutionCache()
+            key = problem_key(blocks, self.board, prob_matrix, linfos,
+                              self.col_bounds())
+            cache_hit = solution_cache.get(key)
+
+        if cache_hit is not None and do_validate:
+            try:
+                check_solutions(name, prob_matrix, cache_hit[0],
+                                col_bounds=self.col_bounds())
+            except ValueError as e:
+                print(f'Discarding cache entry: {e}')
+                solution_cache.discard(key)
+                cache_hit = None
+
+        if cache_hit is not None:
+            solns, meta = cache_hit
+            update_count = meta['updates']
+            elapsed = meta['elapsed']
+            print(f'Solutions found (cached): {len(solns):,}')
+        else:
+            dlx = DLX(name, prob_matrix, col_bounds=self.col_bounds())
+            solns = dlx.find_solutions()
+            update_count = dlx.update_count
+            elapsed = dlx.elapsed
+            if do_validate:
+                check_solutions(name, prob_matrix, solns,
+                                col_bounds=self.col_bounds())
+            if do_use_cache:
+                solution_cache.put(key, solns, self._cache_metadata(
+                    linfos, update_count, elapsed))
+
+        self.update_count = update_count
+        self.elapsed = elapsed
 
         if do_write_solns:
             self.io_write_solutions(solns, solns_filename)
+        if do_write_solns_array:
+            self.io_write_solutions_array(solns, solns_array_filename)
         if do_write_stats:
             stats_filename = self.get_filename(name, 'stats')
             with open(stats_filename, 'a+') as f:
                 datestamp = datetime.now().replace(microsecond=0).isoformat()
-                updates_attr = f'updates={dlx.update_count}'
+                updates_attr = f'updates={update_count}'
                 solns_attr = f'solns={len(solns)}'
-                elapsed_attr = f'elapsed={dlx.elapsed}'
+                elapsed_attr = f'elapsed={elapsed}'
                 attrs = f'{updates_attr}, {solns_attr}, {elapsed_attr}'
+                if cache_hit is not None:
+                    attrs += ', cached=True'
                 f.write(f'{datestamp}: {name}: {attrs}\n')
 
         return solns
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+
+from functools import lru_cache
+import itertools
+import sys
+
+import numpy as np
+
+
+def _orientation_matrices(do_allow_reflections):
+    """The 24 rotations of the cube (or all 48 symmetries, with reflections),
+    as signed permutation matrices. The identity comes first.
+    """
+    result = []
+    for perm in itertools.permutations(range(3)):
+        for signs in itertools.product([1, -1], repeat=3):
+            mat = np.zeros((3, 3), dtype=np.int64)
+            for row, (col, sign) in enumerate(zip(perm, signs)):
+                mat[row, col] = sign
+            if do_allow_reflections or round(np.linalg.det(mat)) == 1:
+                result.append(mat)
+    return result
+
+
+def normalized_coords(coords):
+    """Translate coords to the origin, and sort them into a canonical key."""
+    coords = coords - coords.min(axis=0)
+    return tuple(sorted(map(tuple, coords.tolist())))
+
+
+@lru_cache(maxsize=None)
+def get_orientations(coords_key, do_allow_reflections=False):
+    """The distinct orientations of a polycube, as arrays of cube coordinates.
+    Orientations are deduplicated by hashing their normalized coordinates.
+    Cached by the block's normalized coordinates, so that blocks of the same
+        shape share one orientation table across problems.
+    """
+    coords = np.array(coords_key, dtype=np.int64)
+    seen = set()
+    result = []
+    for mat in _orientation_matrices(do_allow_reflections):
+        key = normalized_coords(coords @ mat.T)
+        if key not in seen:
+            seen.add(key)
+            orientation = np.array(key, dtype=np.int64)
+            orientation.setflags(write=False)
+            result.append(orientation)
+    return tuple(result)
+
+
+def coords_to_layout(coords):
+    layout = np.zeros(coords.max(axis=0) + 1, dtype=np.bool)
+    layout[tuple(coords.T)] = True
+    return layout
+
+
+class Block3D:
+    def __init__(self, name, reference_layout, do_allow_reflections=False):
+        self.name = name
+        self.reference_layout = reference_layout.astype(np.bool)
+        self.do_allow_reflections = do_allow_reflections
+        self.orientations = get_orientations(
+            normalized_coords(np.argwhere(self.reference_layout)),
+            do_allow_reflections)
+        self.layouts = [coords_to_layout(coords)
+                        for coords in self.orientations]
+
+    @classmethod
+    def from_coords(cls, name, coords, do_allow_reflections=False):
+        return cls(name, coords_to_layout(np.array(coords)),
+                   do_allow_reflections)
+
+    def print(self, tag, file=sys.stdout):
+        def fprint(txt, **kwargs):
+            print(txt, file=file, **kwargs)
+
+        def print_ndarray(ndarray, indent=''):
+            ndarray = ndarray.astype(np.int)
+            for zi in range(ndarray.shape[2]):
+                for row in ndarray[:, :, zi]:
+                    fprint(indent, end='')
+                    for item in row:
+                        fprint(item, end='')
+                    fprint('')
+                fprint(f'{indent}....')
+
+        fprint(f'block ({tag}): {self.name}')
+        fprint('\treference_layout:')
+        print_ndarray(self.reference_layout, indent='\t\t')
+        for li, layout in enumerate(self.layouts):
+            fprint(f'\tlayout #{li}:')
+            print_ndarray(layout, indent='\t\t')
+            fprint('\t\t--------------------')
+
+
+# Piet Hein's Soma cube pieces. A and B are mirror images of each other.
+soma_pieces = [
+    Block3D.from_coords('V', [(0, 0, 0), (1, 0, 0), (0, 1, 0)]),
+    Block3D.from_coords('L', [(0, 0, 0), (1, 0, 0), (2, 0, 0), (0, 1, 0)]),
+    Block3D.from_coords('T', [(0, 0, 0), (1, 0, 0), (2, 0, 0), (1, 1, 0)]),
+    Block3D.from_coords('Z', [(0, 0, 0), (1, 0, 0), (1, 1, 0), (2, 1, 0)]),
+    Block3D.from_coords('A', [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 1, 1)]),
+    Block3D.from_coords('B', [(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 0, 1)]),
+    Block3D.from_coords('P', [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]),
+    ]
+
+if __name__ == '__main__':
+    for k, p in enumerate(soma_pieces):
+        p.print(k)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+
+import matplotlib.cm
+import matplotlib.pyplot as plt
+import numpy as np
+
+from block2d_problem import Block2DProblem
+
+
+class Block3DProblem(Block2DProblem):
+    """A block packing problem on a 3-D board, using Block3D blocks.
+    Solving, caching, and file output are shared with Block2DProblem.
+    Placements are found by checking every position of a layout at once.
+    """
+    def __init__(self):
+        pass
+
+    def _get_placements(self, layout):
+        """Valid positions of a layout, and the board cells each one covers.
+        Returns arrays of shape (P, 3) and (P, K, 3), for P positions
+            of a layout with K cubes.
+        """
+        coords = np.argwhere(layout)
+        extent = np.array(self.board.shape) - np.array(layout.shape) + 1
+        if (extent <= 0).any():
+            return np.zeros((0, 3), dtype=np.int64), np.zeros((0, 0, 3),
+                                                              dtype=np.int64)
+        positions = np.indices(tuple(extent)).reshape(3, -1).T
+        cells = positions[:, None, :] + coords[None, :, :]
+        is_valid = self.board[cells[..., 0],
+                              cells[..., 1],
+                              cells[..., 2]].all(axis=1)
+        return positions[is_valid], cells[is_valid]
+
+    def valid_positions(self, layout):
+        positions, _ = self._get_placements(layout)
+        return [tuple(int(x) for x in pos) for pos in positions]
+
+    def _get_prob_matrix(self):
+        assert(self.board is not None)
+        assert(self.blocks is not None)
+
+        block_count = len(self.blocks)
+        board_cell_count = np.count_nonzero(self.board)
+        columns_count = block_count + board_cell_count
+
+        # As in Block2DProblem: blocks first, then playable board spaces.
+        pos2col = (block_count - 1
+                   + np.cumsum(self.board).reshape(self.board.shape))
+
+        row_blocks = []
+        for bi, block in enumerate(self.blocks):
+            for layout in block.layouts:
+                _, cells = self._get_placements(layout)
+                rows = np.zeros((len(cells), columns_count), dtype=np.bool)
+                row_ids = np.arange(len(cells))
+                rows[row_ids, bi] = True
+                rows[row_ids[:, None], pos2col[cells[..., 0],
+                                               cells[..., 1],
+                                               cells[..., 2]]] = True
+                row_blocks.append(rows)
+
+        prob_matrix = np.vstack(row_blocks)
+        return prob_matrix
+
+    def plot_solution(self,
+                      solution,
+                      plot_filename=None,
+                      do_save_plot=True,
+                      do_display=True):
+        def blocknum2color(block_index):
+            return matplotlib.cm.rainbow(block_index / float(len(self.blocks)))
+
+        if plot_filename is None:
+            plot_filename = self.get_filename(self.name, 'plot')
+        filled = np.zeros(self.board.shape, dtype=np.bool)
+        color_mat = np.zeros(self.board.shape + (4,))
+        linfos = self.linfos()
+
+        for lid in solution:
+            linfo = linfos[lid]
+            layout = self.blocks[linfo.block_index].layouts[linfo.layout_index]
+            cells = np.argwhere(layout) + np.array(linfo.pos)
+            filled[tuple(cells.T)] = True
+            color_mat[tuple(cells.T)] = blocknum2color(linfo.block_index)
+
+        fig = plt.figure(num=self.name)
+        ax = fig.add_subplot(projection='3d')
+        ax.voxels(filled, facecolors=color_mat, edgecolor='k')
+        ax.set_axis_off()
+        if do_display:
+            plt.show()
+        if do_save_plot:
+            fig.savefig(fname=plot_filename, format='png')
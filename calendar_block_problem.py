@@ -3,12 +3,15 @@
 
 import os
 import sys
+import time
 
 import numpy as np
 
 from block2d import Block2D, pentominos
 from block2d_problem import Block2DProblem
+from dlx import DLX
 from exact_cover_problem import io_read_prob_matrix
+from solution_validator import validate_solutions
 
 
 month_names = """Jan Feb Mar Apr May Jun
@@ -46,7 +49,7 @@ class CalendarBlockProblem(Block2DProblem):
             return
 
         assert(month in range(12))
-        assert(day in range(31))
+        assert(day in range(1, 31 + 1))
 
         self.name = date_str(month, day)
         self.blocks = self._get_blocks()
@@ -98,6 +101,69 @@ def solve_calendar_problems(do_batch=False):
         solve_month(month)
 
 
+def find_first_calendar_solution(month, day, seed=None, do_batch=False):
+    prob = CalendarBlockProblem(month, day)
+    dlx = DLX(prob.name, prob.prob_matrix)
+    print('-' * 40)
+    print(f'Finding first solution: {prob.name}')
+    soln = dlx.find_first_solution(seed=seed)
+    prob.plot_solution(soln, do_display=not do_batch)
+
+
+def time_first_calendar_solutions(seed=None):
+    """Compare the latency of a randomized first solution, a deterministic
+    first solution, and full enumeration, across all dates.
+    Problem construction is not timed.
+    """
+    times = {'random first': [], 'deterministic first': [], 'all': []}
+    for month in range(12):
+        for day in range(1, days_per_month[month] + 1):
+            prob = CalendarBlockProblem(month, day)
+            dlx = DLX(prob.name, prob.prob_matrix)
+            dlx.find_first_solution(seed=seed, do_print_stats=False)
+            times['random first'].append(dlx.elapsed)
+            dlx.find_solutions(do_print_stats=False, do_print_progress=False,
+                               max_solutions=1)
+            times['deterministic first'].append(dlx.elapsed)
+            dlx.find_solutions(do_print_stats=False, do_print_progress=False)
+            times['all'].append(dlx.elapsed)
+            print('.', end='', flush=True)
+    print()
+    for mode, mode_times in times.items():
+        print(f'{mode:>20}: worst={max(mode_times):.4f}'
+              f', mean={np.mean(mode_times):.4f}')
+
+
+def validate_calendar_solutions():
+    """Check the saved (memory-mapped) solutions of every date.
+    Only the validation itself is timed, not building the problems.
+    """
+    soln_count = 0
+    bad_names = []
+    elapsed = 0.0
+    for month in range(12):
+        for day in range(1, days_per_month[month] + 1):
+            prob = CalendarBlockProblem(month, day)
+            solns_filename = prob.get_filename(prob.name, 'solns_array')
+            if not os.path.exists(solns_filename):
+                print(f'Missing solutions: {solns_filename}')
+                bad_names.append(prob.name)
+                continue
+            solns = prob.io_read_solutions_array(solns_filename)
+            start_time = time.perf_counter()
+            validation = validate_solutions(prob.prob_matrix, solns)
+            elapsed += time.perf_counter() - start_time
+            soln_count += validation.soln_count
+            if validation.invalid or validation.duplicates:
+                print(f'{prob.name}: invalid={validation.invalid}'
+                      f', duplicates={validation.duplicates}')
+                bad_names.append(prob.name)
+    print(f'Solutions checked: {soln_count:,}')
+    print(f'    Dates with missing or bad solutions: {len(bad_names)}')
+    print(f'    Time elapsed: {elapsed:.4f}')
+    return not bad_names
+
+
 def usage():
     def eprint(foo):
         print(foo, file=sys.stderr)
@@ -109,6 +175,9 @@ def usage():
     eprint('\t* --date MONTH DAY: Run for the specified date only')
     eprint('\t\tMONTH should be one of Jan, Feb, ... Dec')
     eprint('\t\tDAY should be an integer in the range 1 .. 31')
+    eprint('\t* --first MONTH DAY: Find one solution quickly, at random')
+    eprint('\t* --first-timing: Time first solutions for all dates')
+    eprint('\t* --validate: Check the saved solutions for all dates')
     eprint('Without no options, all dates are solved, and plots displayed')
 
 
@@ -117,7 +186,11 @@ if __name__ == '__main__':
         solve_calendar_problems()
     elif len(sys.argv) == 2 and sys.argv[1] == '--batch':
         solve_calendar_problems(do_batch=True)
-    elif len(sys.argv) == 4 and sys.argv[1] == '--date':
+    elif len(sys.argv) == 2 and sys.argv[1] == '--first-timing':
+        time_first_calendar_solutions()
+    elif len(sys.argv) == 2 and sys.argv[1] == '--validate':
+        sys.exit(0 if validate_calendar_solutions() else 1)
+    elif len(sys.argv) == 4 and sys.argv[1] in ['--date', '--first']:
         month_str = sys.argv[2]
         day_str = sys.argv[3]
         months = [(m, name) for (m, name) in enumerate(month_names)
@@ -139,6 +212,9 @@ if __name__ == '__main__':
                     print(f'Error: {msg}')
                 else:
                     print(f'Error: Dates must range from 1 to 31')
-            solve_calendar_problem(month, day)
+            if sys.argv[1] == '--first':
+                find_first_calendar_solution(month, day)
+            else:
+                solve_calendar_problem(month, day)
     else:
         usage()
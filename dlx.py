@@ -4,14 +4,29 @@
    See https://www-cs-faculty.stanford.edu/~knuth/programs/dance.w
 """
 
+import itertools
 import numpy as np
 from nptyping import NDArray
+import random
 import sys
 import time
 
 from exact_cover_problem import ExactCoverProblem, io_read_prob_matrix
 
 
+def luby(i):
+    """The i-th term (from 1) of the Luby sequence: 1, 1, 2, 1, 1, 2, 4, ...
+    Restarting after luby(i) units of work is within a log factor of the
+        best fixed restart schedule, without knowing the run-time distribution.
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
 class Node:
     def __init__(self, val=None):
         self.val = val
@@ -47,7 +62,15 @@ class DLX(ExactCoverProblem):
     # --------------------
     # Initialization
     # --------------------
-    def __init__(self, name, matrix: NDArray, do_prioritize_columns=True):
+    def __init__(self, name, matrix: NDArray, do_prioritize_columns=True,
+                 secondary_cols=(), col_bounds=None):
+        """Primary columns must be covered exactly once, by default.
+        secondary_cols: Columns that may be covered at most once.
+        col_bounds: A dict mapping columns to the (lo, hi) range of times
+            they may be covered. Bounds of (0, 1) make a column secondary.
+        Any other bounds switch the search to search_multiplicities(),
+            in the spirit of Knuth's Algorithm M.
+        """
         self.name = name
         self.matrix = matrix
         self.do_prioritize_columns = do_prioritize_columns
@@ -56,8 +79,31 @@ class DLX(ExactCoverProblem):
         self.solution = None  # Preserved across recursive calls to search()
         self.solutions = None
 
+        # Per-run limits and hooks. See find_solutions().
+        self.max_solutions = None
+        self.max_updates = None
+        self.time_limit = None
+        self.on_solution = None
+        self.is_cancelled = None
+        self.do_print_progress = True
+        self.is_stopped = False
+        self.stop_reason = None
+        self.rng = None  # If set, randomizes column ties and row order
+        self.prefix_depth = None  # If set, search() stops at this depth
+        self.prefixes = None  # Rows chosen on the way to each stopping point
+
+        self.row_nodes = {}  # row_index -> first node of that row
+
         col_count = matrix.shape[1]
-        self._init_col_hdrs(col_count)
+        bounds = [(1, 1)] * col_count
+        for col_id in secondary_cols:
+            bounds[col_id] = (0, 1)
+        for col_id, (lo, hi) in (col_bounds or {}).items():
+            assert(0 <= lo <= hi and 1 <= hi)
+            bounds[col_id] = (lo, hi)
+        self.has_multiplicities = any(b not in [(0, 1), (1, 1)]
+                                      for b in bounds)
+        self._init_col_hdrs(col_count, bounds)
         for row_index, row in enumerate(matrix):
             self._init_row(row, row_index)
 
@@ -75,21 +121,28 @@ class DLX(ExactCoverProblem):
         node.C = col_hdr
         return node
 
-    def _init_col_hdrs(self, col_count):
+    def _init_col_hdrs(self, col_count, bounds):
         self.col_hdrs = [Node(k) for k in range(col_count)]
-        for col_hdr in self.col_hdrs:
+        for col_hdr, (lo, hi) in zip(self.col_hdrs, bounds):
             col_hdr.size = 0
+            col_hdr.lo = lo
+            col_hdr.hi = hi
+            col_hdr.count = 0  # Times covered so far. See use_row().
 
+        # Only primary columns join the header DLL, so only they are chosen
+        #     by get_next_column(). Secondary column headers link to
+        #     themselves, which makes removing and restoring them no-ops.
         hdr_iter = self.root  # Start at root
-        for k in range(col_count):
-            hdr_iter.R = self.col_hdrs[k]
-            self.col_hdrs[k].L = hdr_iter
-            hdr_iter = self.col_hdrs[k]  # Move to next col header
+        for col_hdr in self.col_hdrs:
+            if (col_hdr.lo, col_hdr.hi) == (0, 1):
+                continue
+            hdr_iter.R = col_hdr
+            col_hdr.L = hdr_iter
+            hdr_iter = col_hdr  # Move to next col header
 
         # Make column header DLL circular
-        if self.col_hdrs:
-            self.col_hdrs[-1].R = self.root
-            self.root.L = self.col_hdrs[-1]
+        hdr_iter.R = self.root
+        self.root.L = hdr_iter
 
     def _init_row(self, row, row_index):
         nonzero_indices = np.nonzero(row)[0]
@@ -97,6 +150,7 @@ class DLX(ExactCoverProblem):
             return
 
         first_node = self._get_node(nonzero_indices[0], row_index)
+        self.row_nodes[row_index] = first_node
         node_iter = first_node
 
         for col_id in np.nonzero(row)[0][1:]:
@@ -164,18 +218,173 @@ class DLX(ExactCoverProblem):
         col_hdr.R.L = col_hdr
         col_hdr.L.R = col_hdr
 
+    # --------------------
+    # Multiplicity methods
+    # Used only when some column may be covered more than once.
+    # --------------------
+    def hide_row(self, node_i: Node):
+        """Remove a row from every column it is in."""
+        node_j = node_i
+        while True:
+            node_j.D.U = node_j.U
+            node_j.U.D = node_j.D
+            node_j.C.size -= 1
+            node_j = node_j.R
+            if node_j == node_i:
+                break
+
+    def unhide_row(self, node_i: Node):
+        """Undo hide_row()."""
+        node_j = node_i.L
+        while True:
+            node_j.C.size += 1
+            node_j.D.U = node_j
+            node_j.U.D = node_j
+            if node_j == node_i:
+                break
+            node_j = node_j.L
+
+    def use_row(self, node_i: Node):
+        """Count a (hidden) row against each of its columns.
+        Columns that reach their upper bound are removed.
+        Returns the removed columns, for unuse_row().
+        """
+        removed = []
+        node_j = node_i
+        while True:
+            col_hdr = node_j.C
+            col_hdr.count += 1
+            if col_hdr.count == col_hdr.hi:
+                self.remove_column(col_hdr)
+                removed.append(col_hdr)
+            node_j = node_j.R
+            if node_j == node_i:
+                break
+        return removed
+
+    def unuse_row(self, node_i: Node, removed):
+        """Undo use_row()."""
+        for col_hdr in reversed(removed):
+            self.restore_column(col_hdr)
+        node_j = node_i
+        while True:
+            node_j.C.count -= 1
+            node_j = node_j.R
+            if node_j == node_i:
+                break
+
+    def get_next_column_multiplicities(self):
+        """Prefer columns still short of their lower bound, then small ones.
+        Returns None if some column can no longer reach its lower bound.
+        """
+        best_key = None
+        mincol = None
+
+        col_iter = self.root.R
+        while col_iter != self.root:
+            need = col_iter.lo - col_iter.count
+            if need > col_iter.size:
+                return None
+            key = (need <= 0, col_iter.size)
+            if best_key is None or key < best_key:
+                best_key = key
+                mincol = col_iter
+                if not self.do_prioritize_columns:
+                    break
+            col_iter = col_iter.R
+        return mincol
+
+    def search_multiplicities(self, depth=0):
+        """Like search(), but columns may be covered lo..hi times.
+        At each level, branch on each row of the chosen column in turn.
+            Each row tried is then hidden for the rest of the level,
+            so no set of rows is found twice.
+        If the column has already met its lower bound,
+            a last branch covers it with no further rows.
+        """
+        is_empty = self.root.R == self.root
+        if is_empty:
+            self._add_solution()
+            return
+        if self._check_limits():
+            return
+
+        col_hdr = self.get_next_column_multiplicities()
+        if col_hdr is None:
+            return
+        self.update_count += 1
+
+        tried = []
+        for node_i in list(self.column_rows(col_hdr)):
+            self.hide_row(node_i)
+            tried.append(node_i)
+            self.solution.append(node_i.val)
+            removed = self.use_row(node_i)
+            self.search_multiplicities(depth+1)
+            self.unuse_row(node_i, removed)
+            self.solution.pop()
+            if self.is_stopped:
+                break
+        else:
+            if col_hdr.count >= col_hdr.lo:
+                col_hdr.R.L = col_hdr.L
+                col_hdr.L.R = col_hdr.R
+                self.search_multiplicities(depth+1)
+                col_hdr.R.L = col_hdr
+                col_hdr.L.R = col_hdr
+
+        for node_i in reversed(tried):
+            self.unhide_row(node_i)
+
     # --------------------
     # Other methods
     # --------------------
-    def find_solutions(self, do_print_stats=True):
-        self.solution = []
+    def find_solutions(self,
+                       do_print_stats=True,
+                       do_print_progress=True,
+                       max_solutions=None,
+                       max_updates=None,
+                       time_limit=None,
+                       on_solution=None,
+                       is_cancelled=None,
+                       prefix=()):
+        """Run the search, optionally stopping early.
+        max_solutions: Stop after this many solutions have been found.
+        max_updates: Stop after this many nodes of the search tree.
+        time_limit: Stop after this many seconds.
+        on_solution: Called with each solution as soon as it is found.
+        is_cancelled: Polled during the search; stop when it returns True.
+        prefix: Rows already chosen. Only the subtree below them is searched,
+            and each solution found begins with them.
+        The links are fully restored after an early stop,
+            so the same DLX object can be searched again.
+        """
+        self.solution = list(prefix)
         self.solutions = []
         self.update_count = 0  # Note: Incremented within search()
 
+        self.max_solutions = max_solutions
+        self.max_updates = max_updates
+        self.time_limit = time_limit
+        self.on_solution = on_solution
+        self.is_cancelled = is_cancelled
+        self.do_print_progress = do_print_progress
+        self.is_stopped = False
+        self.stop_reason = None
+
         start_time = time.perf_counter()
-        self.search()
+        self.start_time = start_time
+        if self.has_multiplicities:
+            assert(not prefix)
+            self.search_multiplicities()
+        else:
+            self.select_rows(prefix)
+            self.search()
+            self.unselect_rows(prefix)
         stop_time = time.perf_counter()
         self.elapsed = stop_time - start_time
+        if not self.is_stopped:
+            self.stop_reason = 'complete'
 
         if do_print_stats:
             print()
@@ -184,9 +393,137 @@ class DLX(ExactCoverProblem):
             emins = int(self.elapsed / 60)
             esecs = round(self.elapsed) - 60 * emins
             print(f'    Time elapsed: {self.elapsed:.4f} ~ {emins}:{esecs:02}')
+            if self.stop_reason != 'complete':
+                print(f'    Stopped early: {self.stop_reason}')
 
         return self.solutions
 
+    def find_first_solution(self,
+                            seed=None,
+                            base_updates=64,
+                            do_print_stats=True,
+                            max_updates=None,
+                            time_limit=None,
+                            is_cancelled=None):
+        """Find one solution quickly, using randomized restarts.
+        Column ties and row order are randomized (using seed), and the search
+            restarts whenever it exceeds its budget of updates.
+            The budget of the i-th run is base_updates * luby(i).
+        Random restarts avoid the heavy tail of unlucky deterministic runs.
+        max_updates, time_limit, and is_cancelled are as in find_solutions(),
+            but apply to all runs together. stop_reason tells why it ended.
+        Returns the solution, or None if none was found.
+        """
+        self.rng = random.Random(seed)
+        total_update_count = 0
+        start_time = time.perf_counter()
+        try:
+            for run in itertools.count(1):
+                run_max_updates = base_updates * luby(run)
+                if max_updates is not None:
+                    run_max_updates = min(run_max_updates,
+                                          max_updates - total_update_count)
+                run_time_limit = None
+                if time_limit is not None:
+                    run_time_limit = (time_limit
+                                      - (time.perf_counter() - start_time))
+                solns = self.find_solutions(
+                    do_print_stats=False,
+                    do_print_progress=False,
+                    max_solutions=1,
+                    max_updates=run_max_updates,
+                    time_limit=run_time_limit,
+                    is_cancelled=is_cancelled)
+                total_update_count += self.update_count
+                if solns or self.stop_reason in ['complete',
+                                                 'cancelled',
+                                                 'time_limit']:
+                    break
+                if (max_updates is not None
+                        and total_update_count >= max_updates):
+                    break  # stop_reason is already 'max_updates'
+        finally:
+            self.rng = None
+        self.elapsed = time.perf_counter() - start_time
+        self.update_count = total_update_count
+        self.restart_count = run - 1
+
+        if do_print_stats:
+            print(f'First solution found: {bool(solns)}')
+            print(f'    Update count: {self.update_count:,}')
+            print(f'    Restarts: {self.restart_count:,}')
+            print(f'    Time to first solution: {self.elapsed:.4f}')
+            if not solns and self.stop_reason != 'complete':
+                print(f'    Stopped early: {self.stop_reason}')
+
+        return solns[0] if solns else None
+
+    def _stop(self, reason):
+        self.is_stopped = True
+        self.stop_reason = reason
+
+    def _check_limits(self):
+        """Called once per search node. Sets is_stopped if a limit is hit."""
+        if (self.max_updates is not None
+                and self.update_count >= self.max_updates):
+            self._stop('max_updates')
+        elif (self.time_limit is not None
+                and time.perf_counter() - self.start_time >= self.time_limit):
+            self._stop('time_limit')
+        elif self.is_cancelled is not None and self.is_cancelled():
+            self._stop('cancelled')
+        return self.is_stopped
+
+    def _add_solution(self):
+        soln = np.array(self.solution)
+        self.solutions.append(soln)
+        if self.on_solution is not None:
+            self.on_solution(soln)
+        if self.do_print_progress:
+            print('.', end='', flush=True)
+        if (self.max_solutions is not None
+                and len(self.solutions) >= self.max_solutions):
+            self._stop('max_solutions')
+
+    def select_rows(self, rows):
+        """Cover the columns of each row, as if search() had chosen them."""
+        for row_index in rows:
+            node_i = self.row_nodes[row_index]
+            self.remove_column(node_i.C)
+            for node_j in self.rightward_node_iterator(
+                    start=node_i.R,
+                    stop=node_i):
+                self.remove_column(node_j.C)
+
+    def unselect_rows(self, rows):
+        """Undo select_rows(rows)."""
+        for row_index in reversed(rows):
+            node_i = self.row_nodes[row_index]
+            for node_j in self.leftward_node_iterator(
+                    start=node_i.L,
+                    stop=node_i):
+                self.restore_column(node_j.C)
+            self.restore_column(node_i.C)
+
+    def find_prefixes(self, depth):
+        """Walk the search tree down to the given depth, but no further.
+        Returns (prefixes, solutions), where prefixes lists the rows chosen
+            on the way to each open subtree at that depth, and solutions
+            lists any solutions found above it. Searching every prefix with
+            find_solutions(prefix=...) then covers the rest of the tree,
+            and the update counts of all those searches add up to that of
+            a single search.
+        """
+        assert(not self.has_multiplicities)
+        self.prefix_depth = depth
+        self.prefixes = []
+        try:
+            solns = self.find_solutions(do_print_stats=False,
+                                        do_print_progress=False)
+        finally:
+            self.prefix_depth = None
+        return self.prefixes, solns
+
     def get_next_column(self):
         first_col_header = self.root.R
         if not self.do_prioritize_columns:
@@ -194,15 +531,31 @@ class DLX(ExactCoverProblem):
 
         mincol_size = sys.maxsize
         mincol = None
+        tie_count = 0
 
         col_iter = first_col_header
         while col_iter != self.root:
             if col_iter.size < mincol_size:
                 mincol_size = col_iter.size
                 mincol = col_iter
+                tie_count = 1
+            elif col_iter.size == mincol_size and self.rng is not None:
+                # Choose uniformly among ties, by reservoir sampling.
+                tie_count += 1
+                if self.rng.randrange(tie_count) == 0:
+                    mincol = col_iter
             col_iter = col_iter.R
         return mincol
 
+    def column_rows(self, col_hdr: Node):
+        """The rows of a column, in the order the search should try them."""
+        node_is = self.downward_node_iterator(start=col_hdr.D, stop=col_hdr)
+        if self.rng is None:
+            return node_is
+        node_is = list(node_is)
+        self.rng.shuffle(node_is)
+        return node_is
+
     def search(self, depth=0):
         """Repeatedly satisfy columns, steadily accumulating the solution.
         Walk down the search tree with remove_column; up with restore_column.
@@ -212,17 +565,19 @@ class DLX(ExactCoverProblem):
         # When the problem representation is empty, we have solution.
         is_empty = self.root.R == self.root
         if is_empty:
-            self.solutions.append(np.array(self.solution))
-            print('.', end='', flush=True)
+            self._add_solution()
+            return
+        if depth == self.prefix_depth:
+            self.prefixes.append(list(self.solution))
+            return
+        if self._check_limits():
             return
 
         col_hdr = self.get_next_column()
         self.update_count += 1
         self.remove_column(col_hdr)
 
-        for node_i in self.downward_node_iterator(
-                start=col_hdr.D,
-                stop=col_hdr):
+        for node_i in self.column_rows(col_hdr):
             self.solution.append(node_i.val)
             for node_j in self.rightward_node_iterator(
                     start=node_i.R,
@@ -234,6 +589,8 @@ class DLX(ExactCoverProblem):
                     stop=node_i):
                 self.restore_column(node_j.C)
             self.solution.pop()
+            if self.is_stopped:
+                break
 
         self.restore_column(col_hdr)
 
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+"""Distributed enumeration of exact cover solutions.
+   The coordinator walks the DLX search tree down to a chosen depth, and
+       writes each open subtree out as a self-contained job: the rows chosen
+       so far, plus a reference to the problem matrix.
+   Workers on any machine that shares the job directory claim jobs, search
+       the subtrees below them, and write back their solutions.
+   The merged solutions are the same as those of a single-node search.
+
+   Layout of the shared job directory:
+       manifest.json        Job count, and any solutions above the depth
+       problems/<sha>.npy   Problem matrices, named by content hash
+       pending/<job>.json   Jobs waiting for a worker
+       running/<job>.<worker>.json
+                            Claimed jobs. The mtime is the worker's heartbeat.
+       done/<job>.json      Results
+   Claiming a job is an atomic rename from pending/ to running/, so each job
+       has one owner at a time. Jobs whose heartbeat stops are re-queued.
+       Each claim is named for its worker, so that a slow worker whose job
+       was re-queued and claimed again cannot remove the new owner's claim.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+from dlx import DLX
+
+
+DEFAULT_HEARTBEAT_INTERVAL = 5.0
+DEFAULT_STALL_TIMEOUT = 30.0
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+def _write_json(path, obj):
+    """Write atomically, so that readers never see a partial file."""
+    tmp_path = f'{path}.{socket.gethostname()}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _job_names(dirname):
+    return sorted(fname for fname in os.listdir(dirname)
+                  if fname.endswith('.json'))
+
+
+def _claimed_job_name(running_fname):
+    """The pending/ and done/ name for running/<job>.<worker>.json"""
+    return running_fname.split('.', 1)[0] + '.json'
+
+
+def matrix_sha(matrix):
+    matrix = np.ascontiguousarray(matrix, dtype=bool)
+    h = hashlib.sha256(repr(matrix.shape).encode())
+    h.update(matrix.tobytes())
+    return h.hexdigest()
+
+
+class JobDir:
+    def __init__(self, root):
+        self.root = root
+        self.problems = os.path.join(root, 'problems')
+        self.pending = os.path.join(root, 'pending')
+        self.running = os.path.join(root, 'running')
+        self.done = os.path.join(root, 'done')
+        self.manifest = os.path.join(root, 'manifest.json')
+
+    def makedirs(self):
+        for dirname in [self.problems, self.pending, self.running, self.done]:
+            os.makedirs(dirname, exist_ok=True)
+
+
+class Coordinator:
+    def __init__(self, job_root, name, matrix, depth,
+                 do_prioritize_columns=True):
+        self.jobs = JobDir(job_root)
+        self.name = name
+        self.matrix = matrix
+        self.depth = depth
+        self.do_prioritize_columns = do_prioritize_columns
+
+    def write_jobs(self):
+        if os.path.exists(self.jobs.manifest):
+            raise FileExistsError(
+                f'Job directory already in use: {self.jobs.root}')
+        self.jobs.makedirs()
+
+        sha = matrix_sha(self.matrix)
+        prob_relpath = os.path.join('problems', f'{sha}.npy')
+        np.save(os.path.join(self.jobs.root, prob_relpath),
+                self.matrix.astype(bool))
+
+        dlx = DLX(self.name, self.matrix, self.do_prioritize_columns)
+        prefixes, solns = dlx.find_prefixes(self.depth)
+        for k, prefix in enumerate(prefixes):
+            job_id = f'{k:06}'
+            _write_json(os.path.join(self.jobs.pending, f'{job_id}.json'), {
+                'job_id': job_id,
+                'name': self.name,
+                'problem': prob_relpath,
+                'problem_sha': sha,
+                'do_prioritize_columns': self.do_prioritize_columns,
+                'prefix': [int(row) for row in prefix],
+                })
+        _write_json(self.jobs.manifest, {
+            'name': self.name,
+            'depth': self.depth,
+            'job_count': len(prefixes),
+            'updates': dlx.update_count,
+            'solutions': [[int(row) for row in soln] for soln in solns],
+            })
+        print(f'{self.name}: wrote {len(prefixes):,} jobs at depth {self.depth}')
+        return len(prefixes)
+
+    def requeue_stalled(self, stall_timeout):
+        now = time.time()
+        for running_fname in _job_names(self.jobs.running):
+            path = os.path.join(self.jobs.running, running_fname)
+            fname = _claimed_job_name(running_fname)
+            try:
+                is_stalled = now - os.path.getmtime(path) > stall_timeout
+                if is_stalled and not os.path.exists(
+                        os.path.join(self.jobs.done, fname)):
+                    os.rename(path, os.path.join(self.jobs.pending, fname))
+                    print(f'{self.name}: re-queued stalled job'
+                          f' {running_fname}')
+            except FileNotFoundError:
+                pass  # The worker finished the job in the meantime.
+
+    def wait(self, stall_timeout=DEFAULT_STALL_TIMEOUT,
+             poll_interval=DEFAULT_POLL_INTERVAL):
+        job_count = _read_json(self.jobs.manifest)['job_count']
+        while len(_job_names(self.jobs.done)) < job_count:
+            self.requeue_stalled(stall_timeout)
+            time.sleep(poll_interval)
+
+    def merge(self):
+        """Return the solutions of all jobs, plus any found above the depth.
+        Also returns the total number of search tree updates made by the
+            coordinator and the workers.
+        """
+        manifest = _read_json(self.jobs.manifest)
+        solns = [np.array(soln) for soln in manifest['solutions']]
+        update_count = manifest['updates']
+        for fname in _job_names(self.jobs.done):
+            result = _read_json(os.path.join(self.jobs.done, fname))
+            solns.extend(np.array(soln) for soln in result['solutions'])
+            update_count += result['updates']
+        return solns, update_count
+
+
+class Worker:
+    def __init__(self, job_root,
+                 worker_id=None,
+                 heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL):
+        self.jobs = JobDir(job_root)
+        self.worker_id = (worker_id if worker_id is not None
+                          else f'{socket.gethostname()}:{os.getpid()}')
+        # Used in claimed filenames, where a '.' would end the job id.
+        self.claim_tag = self.worker_id.replace('.', '_').replace(os.sep, '_')
+        self.heartbeat_interval = heartbeat_interval
+        self.dlxs = {}  # problem_sha -> DLX, reused across jobs
+
+    def _get_dlx(self, job):
+        sha = job['problem_sha']
+        if sha not in self.dlxs:
+            matrix = np.load(os.path.join(self.jobs.root, job['problem']))
+            if matrix_sha(matrix) != sha:
+                raise ValueError(f'Problem matrix does not match its hash: '
+                                 f'{job["problem"]}')
+            self.dlxs[sha] = DLX(job['name'], matrix,
+                                 job['do_prioritize_columns'])
+        return self.dlxs[sha]
+
+    def claim(self):
+        """Move one pending job to running/, and return its filename.
+        The claimed file is named running/<job>.<worker>.json.
+        """
+        for fname in _job_names(self.jobs.pending):
+            try:
+                running_path = self._running_path(fname)
+                os.rename(os.path.join(self.jobs.pending, fname),
+                          running_path)
+                os.utime(running_path)  # A rename keeps the old mtime.
+                return fname
+            except FileNotFoundError:
+                pass  # Another worker claimed it first.
+        return None
+
+    def _running_path(self, fname):
+        job_id = fname[:-len('.json')]
+        return os.path.join(self.jobs.running,
+                            f'{job_id}.{self.claim_tag}.json')
+
+    def run_job(self, fname):
+        running_path = self._running_path(fname)
+        job = _read_json(running_path)
+
+        stop_heartbeat = threading.Event()
+
+        def heartbeat():
+            while not stop_heartbeat.wait(self.heartbeat_interval):
+                try:
+                    os.utime(running_path)
+                except FileNotFoundError:
+                    return  # Re-queued. Finish anyway; results are idempotent.
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            dlx = self._get_dlx(job)
+            solns = dlx.find_solutions(do_print_stats=False,
+                                       do_print_progress=False,
+                                       prefix=job['prefix'])
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+        _write_json(os.path.join(self.jobs.done, fname), {
+            'job_id': job['job_id'],
+            'worker': self.worker_id,
+            'updates': dlx.update_count,
+            'elapsed': dlx.elapsed,
+            'solutions': [[int(row) for row in soln] for soln in solns],
+            })
+        try:
+            os.remove(running_path)  # Only ever this worker's own claim
+        except FileNotFoundError:
+            pass  # Re-queued while this worker was running it
+
+    def is_finished(self):
+        if not os.path.exists(self.jobs.manifest):
+            return False
+        job_count = _read_json(self.jobs.manifest)['job_count']
+        return len(_job_names(self.jobs.done)) >= job_count
+
+    def run(self, poll_interval=DEFAULT_POLL_INTERVAL):
+        job_count = 0
+        while not self.is_finished():
+            if not os.path.exists(self.jobs.manifest):
+                # The coordinator has not finished writing jobs yet.
+                time.sleep(poll_interval)
+                continue
+            fname = self.claim()
+            if fname is None:
+                time.sleep(poll_interval)
+                continue
+            self.run_job(fname)
+            job_count += 1
+        return job_count
+
+
+def run_worker(job_root, worker_id=None):
+    worker = Worker(job_root, worker_id)
+    job_count = worker.run()
+    print(f'Worker {worker.worker_id}: finished {job_count:,} jobs')
+
+
+def get_problem(problem_spec):
+    """Build a problem matrix from a spec such as chessboard:0 or calendar:Sep:19.
+    Any other spec is read as a prob_ file.
+    """
+    kind, *args = problem_spec.split(':')
+    if kind == 'chessboard':
+        from chessboard_block_problem import mk_chessboard_block_problem
+        prob = mk_chessboard_block_problem(int(args[0]))
+        return prob.name, prob.prob_matrix
+    elif kind == 'calendar':
+        from calendar_block_problem import CalendarBlockProblem, month_names
+        month = month_names.index(args[0])
+        prob = CalendarBlockProblem(month, int(args[1]))
+        return prob.name, prob.prob_matrix
+    else:
+        from exact_cover_problem import io_read_prob_matrix
+        name = os.path.basename(problem_spec)
+        return name, io_read_prob_matrix(problem_spec)
+
+
+def coordinate(args):
+    name, matrix = get_problem(args.problem)
+    coordinator = Coordinator(args.job_dir, name, matrix, args.depth)
+    coordinator.write_jobs()
+
+    workers = [multiprocessing.Process(target=run_worker,
+                                       args=(args.job_dir, f'local{k}'))
+               for k in range(args.local_workers)]
+    start_time = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    coordinator.wait(stall_timeout=args.stall_timeout)
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start_time
+
+    solns, update_count = coordinator.merge()
+    print(f'Solutions found: {len(solns):,}')
+    print(f'    Update count: {update_count:,}')
+    print(f'    Time elapsed: {elapsed:.4f}')
+
+    if args.verify:
+        dlx = DLX(name, matrix)
+        expected = dlx.find_solutions(do_print_progress=False)
+        assert(sorted(map(tuple, solns)) == sorted(map(tuple, expected)))
+        assert(update_count == dlx.update_count)
+        print('Verified: merged solutions and update count match'
+              ' a single-node search')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Distributed DLX enumeration via subtree jobs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coord_parser = subparsers.add_parser('coordinate')
+    coord_parser.add_argument('job_dir')
+    coord_parser.add_argument(
+        'problem', help='chessboard:K, calendar:MONTH:DAY, or a prob_ file')
+    coord_parser.add_argument('--depth', type=int, default=2)
+    coord_parser.add_argument('--local-workers', type=int, default=0)
+    coord_parser.add_argument('--stall-timeout', type=float,
+                              default=DEFAULT_STALL_TIMEOUT)
+    coord_parser.add_argument('--verify', action='store_true')
+
+    work_parser = subparsers.add_parser('work')
+    work_parser.add_argument('job_dir')
+    work_parser.add_argument('--worker-id')
+
+    args = parser.parse_args()
+    if args.command == 'coordinate':
+        coordinate(args)
+    else:
+        run_worker(args.job_dir, args.worker_id)
+
+
+if __name__ == '__main__':
+    main()
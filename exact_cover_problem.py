@@ -9,12 +9,18 @@ class ExactCoverProblem:
         result = f'{prob_name}/{category}_{prob_name}'
         if category == 'plot':
             result += '.png'
+        elif category == 'solns_array':
+            result += '.npy'
         return result
 
     def io_read_solutions(self, solns_filename):
         with open(solns_filename) as f:
             return [np.fromstring(line, dtype=np.int, sep=' ') for line in f]
 
+    def io_read_solutions_array(self, solns_filename, mmap_mode='r'):
+        """Solutions as a 2-D array, memory-mapped by default"""
+        return np.load(solns_filename, mmap_mode=mmap_mode)
+
     def io_write_prob_matrix(self, prob_matrix, prob_filename):
         np.savetxt(prob_filename, prob_matrix.astype(np.int), fmt='%r')
 
@@ -25,6 +31,23 @@ class ExactCoverProblem:
             solns_txt = map(soln_repr, solns)
             f.writelines(solns_txt)
 
+    def io_write_solutions_array(self, solns, solns_filename):
+        """Solutions as a 2-D array, with short solutions padded with -1"""
+        np.save(solns_filename, pad_solutions(solns))
+
 
 def io_read_prob_matrix(prob_filename):
     return np.loadtxt(prob_filename)
+
+
+def pad_solutions(solns):
+    """Stack solutions into a 2-D int array, padding short rows with -1."""
+    width = max((len(soln) for soln in solns), default=0)
+    result = np.full((len(solns), width), -1, dtype=np.int64)
+    for si, soln in enumerate(solns):
+        result[si, :len(soln)] = soln
+    return result
+
+
+def unpad_solutions(padded):
+    return [row[row >= 0] for row in padded]
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+
+import sys
+
+import numpy as np
+
+from dlx import DLX
+from exact_cover_problem import ExactCoverProblem
+
+
+class NQueensProblem(ExactCoverProblem):
+    """Place n non-attacking queens on an n x n board.
+    Each rank and file holds exactly one queen, so those are primary columns.
+    Each diagonal holds at most one queen, so those are secondary columns.
+    With do_pad set, the diagonals are instead made primary, and one slack
+        row per diagonal covers any diagonal left empty. This is the encoding
+        needed by a DLX that supports only exactly-once columns.
+    """
+    def __init__(self, n, do_pad=False):
+        self.n = n
+        self.do_pad = do_pad
+        self.name = f'n_queens_{n}' + ('_padded' if do_pad else '')
+
+        # Columns: n ranks, n files, 2n-1 diagonals, 2n-1 anti-diagonals
+        self.diag_count = 2 * (2 * n - 1)
+        self.secondary_cols = range(2 * n, 2 * n + self.diag_count)
+        self.prob_matrix = self._get_prob_matrix()
+
+    def _get_prob_matrix(self):
+        n = self.n
+        rows = []
+        for i in range(n):
+            for j in range(n):
+                row = np.zeros(2 * n + self.diag_count, dtype=np.bool)
+                row[i] = True
+                row[n + j] = True
+                row[2 * n + i + j] = True
+                row[2 * n + (2 * n - 1) + (n - 1 - i + j)] = True
+                rows.append(row)
+        if self.do_pad:
+            for col_id in self.secondary_cols:
+                row = np.zeros(2 * n + self.diag_count, dtype=np.bool)
+                row[col_id] = True
+                rows.append(row)
+        return np.array(rows, dtype=np.bool)
+
+    def queens(self, solution):
+        """The (rank, file) of each queen. Slack rows are dropped."""
+        return sorted(divmod(int(lid), self.n)
+                      for lid in solution if lid < self.n * self.n)
+
+    def solve(self):
+        print('-' * 40)
+        print(f'Solving problem: {self.name}')
+        secondary_cols = () if self.do_pad else self.secondary_cols
+        self.dlx = DLX(self.name, self.prob_matrix,
+                       secondary_cols=secondary_cols)
+        solns = self.dlx.find_solutions(do_print_progress=False)
+        return [self.queens(soln) for soln in solns]
+
+
+def compare_n_queens_encodings(n):
+    """Solve with secondary columns and with padding; return update counts."""
+    tight = NQueensProblem(n)
+    padded = NQueensProblem(n, do_pad=True)
+    tight_solns = tight.solve()
+    padded_solns = padded.solve()
+    assert(sorted(tight_solns) == sorted(padded_solns))
+    return tight.dlx.update_count, padded.dlx.update_count
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) == 2 else 8
+    tight_updates, padded_updates = compare_n_queens_encodings(n)
+    print()
+    print(f'Update count with secondary columns: {tight_updates:,}')
+    print(f'Update count with padding:           {padded_updates:,}')
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+
+import sys
+
+import numpy as np
+
+from block2d import pentominos
+from block2d_problem import Block2DProblem
+
+
+class OptionalBlockProblem(Block2DProblem):
+    """Cover a board with blocks, each used from min_uses to max_uses times.
+    Every board space is still covered exactly once.
+    With max_uses == 1 the block columns are secondary. Otherwise they have
+        multiplicities, and DLX searches with search_multiplicities().
+    With do_pad set (only for min_uses=0, max_uses=1), the block columns are
+        instead kept exactly-once, and one slack row per block covers any
+        block left out. This is the encoding needed without secondary columns.
+    """
+    def __init__(self, name, blocks, board,
+                 min_uses=0, max_uses=1, do_pad=False):
+        assert(not do_pad or (min_uses, max_uses) == (0, 1))
+        self.name = name + ('_padded' if do_pad else '')
+        self.blocks = blocks
+        self.board = board
+        self.min_uses = min_uses
+        self.max_uses = max_uses
+        self.do_pad = do_pad
+        self.prob_matrix = self._get_prob_matrix()
+        if do_pad:
+            slack_rows = np.zeros((len(blocks), self.prob_matrix.shape[1]),
+                                  dtype=np.bool)
+            for bi in range(len(blocks)):
+                slack_rows[bi, bi] = True
+            self.prob_matrix = np.vstack([self.prob_matrix, slack_rows])
+
+    def col_bounds(self):
+        if self.do_pad:
+            return None
+        return {bi: (self.min_uses, self.max_uses)
+                for bi in range(len(self.blocks))}
+
+
+def mk_pentomino_rectangle_problem(height, width, max_uses=1, do_pad=False):
+    """Tile a rectangle with any of the twelve pentominos."""
+    board = np.ones((height, width), dtype=np.bool)
+    name = f'pentomino_rectangle_{height}x{width}_max{max_uses}'
+    return OptionalBlockProblem(name, pentominos, board,
+                                max_uses=max_uses, do_pad=do_pad)
+
+
+def compare_optional_block_encodings(height, width):
+    """Solve with secondary block columns and with padding.
+    Returns both update counts.
+    """
+    tight = mk_pentomino_rectangle_problem(height, width)
+    padded = mk_pentomino_rectangle_problem(height, width, do_pad=True)
+    tight_solns = tight.solve(do_use_cache=False)
+    padded_solns = padded.solve(do_use_cache=False)
+    row_count = len(tight.linfos())
+
+    def normalize(solns):
+        return sorted(tuple(sorted(lid for lid in soln if lid < row_count))
+                      for soln in solns)
+    assert(normalize(tight_solns) == normalize(padded_solns))
+    return tight.update_count, padded.update_count
+
+
+if __name__ == '__main__':
+    height, width = 4, 5
+    if len(sys.argv) == 3:
+        height, width = int(sys.argv[1]), int(sys.argv[2])
+    tight_updates, padded_updates = compare_optional_block_encodings(height,
+                                                                     width)
+    print()
+    print(f'Update count with secondary columns: {tight_updates:,}')
+    print(f'Update count with padding:           {padded_updates:,}')
+
+    prob = mk_pentomino_rectangle_problem(height, width, max_uses=2)
+    solns = prob.solve()
+    prob.plot_solution(solns[0])
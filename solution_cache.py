@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+"""A content-addressed on-disk cache of problem solutions.
+   Each entry is keyed by a hash of the canonical problem---its blocks,
+       board, problem matrix (which reflects any constraints), and row order
+       (linfos)---so a cached entry is reused only when none of those change.
+   Each entry stores the solutions together with the layouts and linfos
+       needed to interpret them, so they remain readable if the code changes.
+"""
+
+import hashlib
+import io
+import json
+import os
+import time
+import zipfile
+import zlib
+
+import numpy as np
+
+from exact_cover_problem import pad_solutions, unpad_solutions
+
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = 'solution_cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Temporary files older than this (in seconds) are from crashed writers.
+STALE_TMP_AGE = 60 * 60
+
+
+def problem_key(blocks, board, prob_matrix, linfos, col_bounds=None):
+    """A hex digest that identifies a block problem and its row order."""
+    h = hashlib.sha256()
+
+    def add_array(a):
+        a = np.ascontiguousarray(a, dtype=np.uint8)
+        h.update(repr(a.shape).encode())
+        h.update(a.tobytes())
+
+    h.update(f'v{CACHE_FORMAT_VERSION}'.encode())
+    for block in blocks:
+        h.update(block.name.encode())
+        for layout in block.layouts:
+            add_array(layout)
+    add_array(board)
+    add_array(prob_matrix)
+    for linfo in linfos:
+        h.update(repr(tuple(linfo)).encode())
+    if col_bounds:
+        h.update(repr(sorted(col_bounds.items())).encode())
+    return h.hexdigest()
+
+
+class SolutionCache:
+    """Solutions on disk, one .npz file per problem.
+    The least recently used entries are evicted once the cache exceeds
+        max_bytes. Entries that fail their integrity check are discarded.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    @staticmethod
+    def _checksum(key, padded):
+        h = hashlib.sha256(key.encode())
+        h.update(repr(padded.shape).encode())
+        h.update(np.ascontiguousarray(padded, dtype=np.int64).tobytes())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Return (solutions, metadata), or None on a miss."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                padded = data['solns']
+                meta = json.loads(str(data['meta']))
+            if (meta.get('key') != key
+                    or meta.get('checksum') != self._checksum(key, padded)):
+                raise ValueError(f'Integrity check failed: {path}')
+        except (OSError, ValueError, KeyError, EOFError,
+                zipfile.BadZipFile, zlib.error) as e:
+            print(f'Discarding cache entry: {e}')
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None  # Evicted by another process since it was read
+        return unpad_solutions(padded), meta
+
+    def put(self, key, solns, meta):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        padded = pad_solutions(solns)
+        meta = dict(meta, key=key, checksum=self._checksum(key, padded))
+
+        buf = io.BytesIO()
+        np.savez_compressed(buf, solns=padded, meta=np.array(json.dumps(meta)))
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(buf.getvalue())
+        os.replace(tmp_path, path)  # Atomic, so readers never see partial files
+        self.evict()
+
+    def discard(self, key):
+        """Remove an entry, e.g., one whose solutions failed validation."""
+        self._remove(self._path(key))
+
+    def evict(self):
+        entries = []
+        now = time.time()
+        for fname in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, fname)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # Removed by another process since listdir()
+            if fname.endswith('.npz'):
+                entries.append((st.st_mtime, st.st_size, path))
+            elif (fname.endswith('.tmp')
+                  and now - st.st_mtime > STALE_TMP_AGE):
+                self._remove(path)  # Left by a writer that crashed
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+"""Check that solutions really are exact covers, many solutions at a time.
+   Solutions are given as a 2-D array of row indices, one solution per row,
+       with shorter solutions padded with -1 (see pad_solutions).
+   Each chunk of solutions is checked with one gather of the problem rows
+       and one sum over them, so memory-mapped solution files can be checked
+       without reading them into memory all at once.
+"""
+
+from collections import namedtuple
+import sys
+
+import numpy as np
+
+from exact_cover_problem import (ExactCoverProblem, io_read_prob_matrix,
+                                 pad_solutions)
+
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+"""The result of validate_solutions()
+   invalid: Indices of solutions that do not cover every column correctly
+   duplicates: Indices of solutions that repeat an earlier solution
+       (the same set of rows, in any order)
+"""
+Validation = namedtuple('Validation', ['soln_count', 'invalid', 'duplicates'])
+
+
+def validate_solutions(prob_matrix, solns,
+                       secondary_cols=(),
+                       col_bounds=None,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+    """Check each solution against the column bounds used by DLX.
+    By default, every column must be covered exactly once.
+    solns may be a list of 1-D arrays, or a (possibly memory-mapped) 2-D array.
+    """
+    if not isinstance(solns, np.ndarray):
+        solns = pad_solutions(solns)
+    row_count, col_count = prob_matrix.shape
+
+    lo = np.ones(col_count, dtype=np.int64)
+    hi = np.ones(col_count, dtype=np.int64)
+    lo[list(secondary_cols)] = 0
+    for col_id, (col_lo, col_hi) in (col_bounds or {}).items():
+        lo[col_id] = col_lo
+        hi[col_id] = col_hi
+
+    # Padding (-1) gathers an extra all-zero row, which covers nothing.
+    matrix = np.zeros((row_count + 1, col_count), dtype=np.uint8)
+    matrix[:row_count] = prob_matrix != 0
+
+    invalid = []
+    duplicates = []
+    first_indices = {}  # Canonical solution bytes -> first index seen
+    for start in range(0, len(solns), chunk_size):
+        chunk = np.asarray(solns[start:start + chunk_size])
+        is_out_of_range = ((chunk < -1) | (chunk >= row_count)).any(axis=1)
+        row_ids = np.where(chunk < 0, row_count, chunk)
+        row_ids = np.clip(row_ids, 0, row_count)
+        covers = matrix[row_ids].sum(axis=1)
+        is_valid = ((covers >= lo) & (covers <= hi)).all(axis=1)
+        is_valid &= ~is_out_of_range
+        invalid.extend(start + np.nonzero(~is_valid)[0])
+
+        # Sort within each solution, so that row order does not matter,
+        # then key each solution by its bytes.
+        canonical = np.ascontiguousarray(np.sort(chunk, axis=1),
+                                         dtype=np.int64)
+        keys = canonical.view(np.dtype((np.void,
+                                        canonical.itemsize
+                                        * canonical.shape[1]))).ravel()
+        for si, key in enumerate(keys.tolist(), start):
+            if first_indices.setdefault(key, si) != si:
+                duplicates.append(si)
+
+    return Validation(soln_count=len(solns),
+                      invalid=[int(i) for i in invalid],
+                      duplicates=duplicates)
+
+
+def check_solutions(name, prob_matrix, solns, **kwargs):
+    """Validate solutions, raising ValueError if any are bad."""
+    validation = validate_solutions(prob_matrix, solns, **kwargs)
+    if validation.invalid or validation.duplicates:
+        raise ValueError(
+            f'{name}: {len(validation.invalid)} invalid and'
+            f' {len(validation.duplicates)} duplicate solutions'
+            f' of {validation.soln_count}'
+            f' (first invalid: {validation.invalid[:5]},'
+            f' first duplicates: {validation.duplicates[:5]})')
+    return validation
+
+
+if __name__ == '__main__':
+    def main(prob_filename, solns_filename):
+        prob_matrix = io_read_prob_matrix(prob_filename)
+        if solns_filename.endswith('.npy'):
+            solns = ExactCoverProblem().io_read_solutions_array(solns_filename)
+        else:
+            solns = ExactCoverProblem().io_read_solutions(solns_filename)
+        validation = validate_solutions(prob_matrix, solns)
+        print(f'Solutions checked: {validation.soln_count:,}')
+        print(f'    Invalid: {len(validation.invalid):,}')
+        print(f'    Duplicates: {len(validation.duplicates):,}')
+        return 1 if validation.invalid or validation.duplicates else 0
+
+    assert(len(sys.argv) == 3)
+    sys.exit(main(sys.argv[1], sys.argv[2]))
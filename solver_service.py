@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+"""A long-running solver service for the Calendar Block Problem.
+   Building a problem (imports, block orientations, problem matrix, DLX links)
+       costs far more than a typical date lookup, so the service builds each
+       problem once per worker process and keeps it warm for later requests.
+   Searches run in a pool of worker processes, and solutions are streamed
+       back to the client as soon as they are found.
+
+   Protocol: newline-delimited JSON over a Unix socket or localhost TCP.
+   Requests:
+       {"op": "solve", "id": ID, "month": "Sep", "day": 19,
+        "max_solutions": N, "max_updates": N, "time_limit": SECONDS}
+       {"op": "solve", "id": ID, "month": "Sep", "day": 19,
+        "first": true, "seed": N}
+           Returns one solution, found by randomized restarts.
+           max_updates and time_limit apply to all restarts together.
+       {"op": "cancel", "id": ID}
+   Responses (tagged with the request id):
+       {"id": ID, "solution": [ROW, ...], "placements": [[NAME, LI, [I, J]], ...]}
+       {"id": ID, "done": true, "solns": N, "updates": N,
+        "elapsed": SECONDS, "stop_reason": REASON}
+       {"id": ID, "error": MESSAGE}
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import multiprocessing
+import queue
+import sys
+
+from calendar_block_problem import (CalendarBlockProblem,
+                                    days_per_month, month_names)
+from dlx import DLX
+
+
+# How often (in search nodes) a worker polls for cancellation.
+# Polling a managed Event is an IPC round trip, so it is kept infrequent.
+CANCEL_POLL_INTERVAL = 1024
+
+# How long (in seconds) the server blocks on a request's queue at a time,
+#     so that a read never outlives the worker that should answer it.
+QUEUE_POLL_INTERVAL = 0.5
+
+
+# --------------------
+# Worker process
+# --------------------
+_engines = {}  # (month, day) -> (prob, dlx, linfos). One cache per worker.
+
+
+def _get_engine(month, day):
+    key = (month, day)
+    if key not in _engines:
+        prob = CalendarBlockProblem(month, day)
+        dlx = DLX(prob.name, prob.prob_matrix)
+        _engines[key] = (prob, dlx, prob.linfos())
+    return _engines[key]
+
+
+def _init_worker(prewarm_dates):
+    for month, day in prewarm_dates:
+        _get_engine(month, day)
+
+
+def _throttled(f, interval):
+    """Return a function that calls f only once every interval calls."""
+    count = 0
+
+    def g():
+        nonlocal count
+        count += 1
+        if count < interval:
+            return False
+        count = 0
+        return f()
+    return g
+
+
+def _solve_in_worker(month, day, limits, soln_queue, cancel_event,
+                     first=False, seed=None):
+    try:
+        prob, dlx, linfos = _get_engine(month, day)
+
+        def on_solution(soln):
+            placements = [[linfos[lid].name,
+                           linfos[lid].layout_index,
+                           list(linfos[lid].pos)]
+                          for lid in soln]
+            soln_queue.put(('solution', {'solution': [int(x) for x in soln],
+                                         'placements': placements}))
+
+        is_cancelled = _throttled(cancel_event.is_set, CANCEL_POLL_INTERVAL)
+        if first:
+            # max_solutions is implicitly 1.
+            first_limits = {k: v for k, v in limits.items()
+                            if k != 'max_solutions'}
+            soln = dlx.find_first_solution(seed=seed,
+                                           do_print_stats=False,
+                                           is_cancelled=is_cancelled,
+                                           **first_limits)
+            if soln is not None:
+                on_solution(soln)
+            soln_queue.put(('done', {'done': True,
+                                     'solns': int(soln is not None),
+                                     'updates': dlx.update_count,
+                                     'elapsed': dlx.elapsed,
+                                     'restarts': dlx.restart_count,
+                                     'stop_reason': dlx.stop_reason}))
+            return
+
+        dlx.find_solutions(
+            do_print_stats=False,
+            do_print_progress=False,
+            on_solution=on_solution,
+            is_cancelled=is_cancelled,
+            **limits)
+        soln_queue.put(('done', {'done': True,
+                                 'solns': len(dlx.solutions),
+                                 'updates': dlx.update_count,
+                                 'elapsed': dlx.elapsed,
+                                 'stop_reason': dlx.stop_reason}))
+    except Exception as e:
+        # A search that raised may have left its links half unwound,
+        #     so the engine is rebuilt on the next request for this date.
+        _engines.pop((month, day), None)
+        soln_queue.put(('error', {'error': f'{type(e).__name__}: {e}'}))
+
+
+# --------------------
+# Server
+# --------------------
+def _get_message(soln_queue, timeout):
+    """The next message from a worker, or None if none arrives in time."""
+    try:
+        return soln_queue.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+def parse_date(month_str, day):
+    months = [m for (m, name) in enumerate(month_names)
+              if name.lower() == str(month_str).lower()]
+    if not months:
+        raise ValueError(f'Unrecognized month name: {month_str}')
+    month = months[0]
+    day = int(day)
+    if day not in range(1, days_per_month[month] + 1):
+        raise ValueError('Dates for that month must range from 1'
+                         f' to {days_per_month[month]}')
+    return month, day
+
+
+def parse_limit(key, value):
+    """A request limit: a positive int, or a positive number for time_limit."""
+    types = (int, float) if key == 'time_limit' else (int,)
+    if isinstance(value, bool) or not isinstance(value, types) or value <= 0:
+        kind = 'number' if key == 'time_limit' else 'integer'
+        raise ValueError(f'{key} must be a positive {kind}: {value!r}')
+    return value
+
+
+def all_dates():
+    return [(month, day)
+            for month in range(12)
+            for day in range(1, days_per_month[month] + 1)]
+
+
+class SolverService:
+    LIMIT_KEYS = ['max_solutions', 'max_updates', 'time_limit']
+
+    def __init__(self, worker_count, prewarm_dates=()):
+        self.worker_count = worker_count
+        self.prewarm_dates = list(prewarm_dates)
+        self.manager = multiprocessing.Manager()
+        self.pool = self._new_pool()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.worker_count,
+                                   initializer=_init_worker,
+                                   initargs=(self.prewarm_dates,))
+
+    def _replace_broken_pool(self, pool):
+        """A dead worker breaks the whole pool, so start a new one.
+        Only the first request to notice a given broken pool replaces it.
+        """
+        if self.pool is pool:
+            print('Worker pool broken; starting a new one', file=sys.stderr)
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+
+    def _submit(self, *args):
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return pool, loop.run_in_executor(pool, _solve_in_worker, *args)
+        except BrokenProcessPool:
+            self._replace_broken_pool(pool)
+            pool = self.pool
+            return pool, loop.run_in_executor(pool, _solve_in_worker, *args)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.manager.shutdown()
+
+    async def handle_client(self, reader, writer):
+        write_lock = asyncio.Lock()
+        cancel_events = {}  # request id -> manager Event
+        tasks = set()
+
+        async def send(msg):
+            async with write_lock:
+                writer.write((json.dumps(msg) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    req = json.loads(line)
+                except json.JSONDecodeError as e:
+                    await send({'id': None, 'error': f'Bad JSON: {e}'})
+                    continue
+                req_id = req.get('id')
+                op = req.get('op', 'solve')
+                if op == 'cancel':
+                    if req_id in cancel_events:
+                        cancel_events[req_id].set()
+                elif op == 'solve':
+                    cancel_event = self.manager.Event()
+                    cancel_events[req_id] = cancel_event
+                    task = asyncio.create_task(
+                        self.solve(req, cancel_event, send))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    task.add_done_callback(
+                        lambda _, rid=req_id: cancel_events.pop(rid, None))
+                else:
+                    await send({'id': req_id, 'error': f'Unknown op: {op}'})
+        finally:
+            # The client went away: stop any searches it still owns.
+            for cancel_event in cancel_events.values():
+                cancel_event.set()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def solve(self, req, cancel_event, send):
+        req_id = req.get('id')
+        try:
+            month, day = parse_date(req.get('month'), req.get('day'))
+            limits = {k: parse_limit(k, req[k]) for k in self.LIMIT_KEYS
+                      if req.get(k) is not None}
+        except (TypeError, ValueError) as e:
+            await send({'id': req_id, 'error': str(e)})
+            return
+
+        loop = asyncio.get_running_loop()
+        soln_queue = self.manager.Queue()
+        pool, future = self._submit(month, day, limits,
+                                    soln_queue, cancel_event,
+                                    bool(req.get('first')), req.get('seed'))
+        get_future = None
+        try:
+            while True:
+                if get_future is None:
+                    get_future = loop.run_in_executor(
+                        None, _get_message, soln_queue, QUEUE_POLL_INTERVAL)
+                # Watch the worker too, in case it dies without answering.
+                waitables = {get_future}
+                if not future.done():
+                    waitables.add(future)
+                await asyncio.wait(waitables,
+                                   return_when=asyncio.FIRST_COMPLETED)
+
+                if future.done() and future.exception() is not None:
+                    e = future.exception()
+                    if isinstance(e, BrokenProcessPool):
+                        self._replace_broken_pool(pool)
+                    await send({'id': req_id,
+                                'error': f'Worker failed: {type(e).__name__}'})
+                    break
+                if not get_future.done():
+                    continue
+                msg = get_future.result()
+                get_future = None
+                if msg is None:
+                    if future.done():
+                        await send({'id': req_id,
+                                    'error': 'Worker exited without a result'})
+                        break
+                    continue
+
+                kind, payload = msg
+                await send({'id': req_id, **payload})
+                if kind != 'solution':
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            cancel_event.set()
+            raise
+        finally:
+            if not future.done():
+                cancel_event.set()
+            await asyncio.gather(future, return_exceptions=True)
+
+
+async def serve(args):
+    if args.prewarm == 'all':
+        prewarm_dates = all_dates()
+    elif args.prewarm == 'none':
+        prewarm_dates = []
+    else:
+        prewarm_dates = [parse_date(*d.split('-'))
+                         for d in args.prewarm.split(',')]
+    service = SolverService(args.workers, prewarm_dates)
+    try:
+        if args.socket:
+            server = await asyncio.start_unix_server(service.handle_client,
+                                                     path=args.socket)
+            where = args.socket
+        else:
+            server = await asyncio.start_server(service.handle_client,
+                                                host=args.host,
+                                                port=args.port)
+            where = f'{args.host}:{args.port}'
+        print(f'Solver service listening on {where}', file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+# --------------------
+# Client
+# --------------------
+async def request(args):
+    if args.socket:
+        reader, writer = await asyncio.open_unix_connection(args.socket)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    req = {'op': 'solve', 'id': 1, 'month': args.month, 'day': args.day,
+           'max_solutions': args.max_solutions,
+           'max_updates': args.max_updates,
+           'time_limit': args.time_limit,
+           'first': args.first}
+    writer.write((json.dumps(req) + '\n').encode())
+    await writer.drain()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        print(line.decode(), end='')
+        msg = json.loads(line)
+        if 'done' in msg or 'error' in msg:
+            break
+    writer.close()
+    await writer.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Warm solver service for the Calendar Block Problem')
+    parser.add_argument('--socket', help='Unix socket path (default: TCP)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve')
+    serve_parser.add_argument('--workers', type=int,
+                              default=multiprocessing.cpu_count())
+    serve_parser.add_argument(
+        '--prewarm', default='none',
+        help='"all", "none", or a list of dates such as Jan-1,Sep-19')
+
+    client_parser = subparsers.add_parser('client')
+    client_parser.add_argument('month')
+    client_parser.add_argument('day', type=int)
+    client_parser.add_argument('--max-solutions', type=int)
+    client_parser.add_argument('--max-updates', type=int)
+    client_parser.add_argument('--time-limit', type=float)
+    client_parser.add_argument('--first', action='store_true',
+                               help='Return one solution, found at random')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        asyncio.run(serve(args))
+    else:
+        asyncio.run(request(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# Copyright (2021) by Jay M. Coskey
+
+import sys
+
+import numpy as np
+
+from block3d import soma_pieces
+from block3d_problem import Block3DProblem
+
+
+class SomaCubeProblem(Block3DProblem):
+    """Piet Hein's Soma cube: pack the seven Soma pieces into a 3x3x3 cube.
+    Pieces may be rotated, but not reflected.
+    """
+    def __init__(self, name='soma_cube_problem'):
+        self.name = name
+        self.blocks = soma_pieces
+        self.board = np.ones((3, 3, 3), dtype=np.bool)
+        self.prob_matrix = self._get_prob_matrix()
+
+
+def solve_soma_cube_problem(do_batch=False):
+    # 240 distinct solutions, times the 48 symmetries of the cube.
+    # (Reflecting a solution swaps the mirror-image pieces A and B.)
+    expected_soln_count = 240 * 48
+    prob = SomaCubeProblem()
+    solns = prob.solve()
+    assert(len(solns) == expected_soln_count)
+    prob.plot_solution(solns[0], do_display=not do_batch)
+
+
+if __name__ == '__main__':
+    do_batch = len(sys.argv) == 2 and sys.argv[1] == '--batch'
+    solve_soma_cube_problem(do_batch)